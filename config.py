@@ -1,56 +1,83 @@
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Literal
+from typing import Annotated, Any, List, Literal
+from zoneinfo import ZoneInfo
 
 import yaml
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, field_validator
+
+
+# libyaml-backed loader when PyYAML was built with it, pure-Python otherwise
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _upper(v: Any) -> Any:
+    """Uppercase strings ahead of Literal validation, leave other input for pydantic to reject."""
+    return v.strip().upper() if isinstance(v, str) else v
+
+
+LogLevel = Annotated[Literal["DEBUG", "INFO", "WARNING", "ERROR"], BeforeValidator(_upper)]
+
+
+@lru_cache(maxsize=8)
+def get_tz(timezone: str) -> ZoneInfo:
+    """Return ZoneInfo for timezone name, cached per name."""
+    return ZoneInfo(timezone)
+
+
+@lru_cache(maxsize=64)
+def parse_hour_minute(value: str) -> tuple[int, int] | None:
+    """Parse 'HH:MM' into (hour, minute), None for 'sunrise'/'sunset'. Raises ValueError if invalid."""
+    if value in ("sunrise", "sunset"):
+        return None
+    try:
+        hour, minute = map(int, value.split(":"))
+    except ValueError:
+        raise ValueError(f"time must be 'HH:MM', 'sunrise' or 'sunset', got: {value}") from None
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"time must be a valid 'HH:MM', got: {value}")
+    return hour, minute
 
 
 class Schedule(BaseModel):
     """Single schedule definition."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid", str_strip_whitespace=True)
+
     time: str = Field(..., description="Time: 'HH:MM', 'sunrise', or 'sunset'")
     action: Literal["on", "off"] = Field(..., description="Turn switch on or off")
     offset: int = Field(0, description="Minutes offset for sunrise/sunset (+ after, - before)")
 
+    @field_validator("time")
+    @classmethod
+    def validate_time(cls, v: str) -> str:
+        """Validate time is 'sunrise', 'sunset' or a valid 'HH:MM'."""
+        parse_hour_minute(v)
+        return v
+
+    @property
+    def hour_minute(self) -> tuple[int, int] | None:
+        """Parsed (hour, minute) for fixed-time schedules, None for sunrise/sunset."""
+        # Derived from time on each access so model_copy(update=...) cannot leave it stale; the parse is cached
+        return parse_hour_minute(self.time)
+
 
 class ShellyConfig(BaseModel):
     """Configuration for Shelly automation. All fields required (fail-fast)."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid", str_strip_whitespace=True)
+
     shelly_ip: str = Field(..., description="Device IP address")
 
-    latitude: float = Field(..., description="Location latitude")
-    longitude: float = Field(..., description="Location longitude")
+    latitude: float = Field(..., ge=-90, le=90, description="Location latitude")
+    longitude: float = Field(..., ge=-180, le=180, description="Location longitude")
     timezone: str = Field(..., description="Timezone e.g. Europe/Tallinn")
 
     schedules: List[Schedule] = Field(..., description="List of schedule definitions")
 
-    log_level: str = Field(..., description="DEBUG, INFO, WARNING, ERROR")
+    log_level: LogLevel = Field(..., description="DEBUG, INFO, WARNING, ERROR")
     log_file: str = Field(..., description="Path to log file")
-
-    @field_validator("log_level")
-    @classmethod
-    def validate_log_level(cls, v: str) -> str:
-        """Validate log level."""
-        allowed = ["DEBUG", "INFO", "WARNING", "ERROR"]
-        if v.upper() not in allowed:
-            raise ValueError(f"log_level must be one of {allowed}, got: {v}")
-        return v.upper()
-
-    @field_validator("latitude")
-    @classmethod
-    def validate_latitude(cls, v: float) -> float:
-        """Validate latitude range."""
-        if not -90 <= v <= 90:
-            raise ValueError(f"latitude must be between -90 and 90, got: {v}")
-        return v
-
-    @field_validator("longitude")
-    @classmethod
-    def validate_longitude(cls, v: float) -> float:
-        """Validate longitude range."""
-        if not -180 <= v <= 180:
-            raise ValueError(f"longitude must be between -180 and 180, got: {v}")
-        return v
+    debug_tracebacks: bool = Field(False, description="Include extended tracebacks with variable values in logs")
 
     @classmethod
     def from_yaml(cls, path: str = "config.yaml") -> "ShellyConfig":
@@ -59,11 +86,21 @@ class ShellyConfig(BaseModel):
         if not config_path.exists():
             raise FileNotFoundError(f"Config file not found: {path}")
 
-        with open(config_path, "r") as f:
-            data = yaml.safe_load(f)
+        raw = config_path.read_bytes()
+        if not raw.strip():
+            raise ValueError(f"Config file is empty: {path}")
+
+        data = yaml.load(raw, Loader=YAML_LOADER)
+        if not isinstance(data, dict):
+            raise ValueError(f"Config file must contain a YAML mapping of settings: {path}")
 
         return cls(**data)
 
+    @property
+    def tz(self) -> ZoneInfo:
+        """Timezone object for timezone, shared with schedule_calculator through get_tz."""
+        return get_tz(self.timezone)
+
     def get_schedules(self) -> List[Schedule]:
         """Return schedule list."""
         return self.schedules
@@ -6,20 +6,36 @@ from types import TracebackType
 from typing import Optional, Type
 
 
-def setup_loguru_logger(level: str, log_file: Optional[str] = None) -> None:
+def setup_loguru_logger(level: str, log_file: Optional[str] = None, debug_tracebacks: bool = False) -> None:
     """Setup loguru logger with custom format."""
     logger.remove()
+    # Variable-annotated tracebacks are costly; only on DEBUG or when explicitly requested
+    diagnose = debug_tracebacks or level == "DEBUG"
     log_format = (
         "<green>{time:YYYY-MM-DD HH:mm:ss.SSS ZZ}</green> | <level>{level: <8}</level> | "
-        "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>{exception}"
+        "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
     )
-    logger.add(sys.stderr, level=level, format=log_format, colorize=True, backtrace=True, diagnose=True)
+    # Same layout without color markup, so the file sink has no tags to strip; loguru appends the exception to both
+    file_log_format = "{time:YYYY-MM-DD HH:mm:ss.SSS ZZ} | {level: <8} | {name}:{function}:{line} - {message}"
+    logger.add(sys.stderr, level=level, format=log_format, colorize=sys.stderr.isatty(), backtrace=True, diagnose=diagnose)
 
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
 
-        logger.add(log_file, level=level, format=log_format, colorize=False, backtrace=True, diagnose=True, rotation="00:00", retention="14 days")
+        # Buffered writes from a background thread; loguru flushes and closes the sink at exit
+        logger.add(
+            log_file,
+            level=level,
+            format=file_log_format,
+            colorize=False,
+            backtrace=debug_tracebacks,
+            diagnose=debug_tracebacks,
+            rotation="00:00",
+            retention="14 days",
+            buffering=65536,
+            enqueue=True,
+        )
 
 
 def handle_exception(exc_type: Type[BaseException], exc_value: BaseException, exc_traceback: Optional[TracebackType], stack_row_limit: int = 10) -> None:
@@ -31,7 +47,7 @@ def handle_exception(exc_type: Type[BaseException], exc_value: BaseException, ex
         logger.error(f"An unhandled exception occurred: {exc_type.__name__}: {exc_value}, traceback: {traceback_string}")
 
 
-def init_logging(level: str, log_file: Optional[str] = None) -> None:
+def init_logging(level: str, log_file: Optional[str] = None, debug_tracebacks: bool = False) -> None:
     """Initialize logging with exception handling."""
-    setup_loguru_logger(level, log_file)
+    setup_loguru_logger(level, log_file, debug_tracebacks)
     sys.excepthook = handle_exception
@@ -1,24 +1,37 @@
+import argparse
 import sys
 from datetime import datetime
+from typing import Any
 
-from colorama import init as colorama_init
 from loguru import logger
 
 from config import ShellyConfig
 from logging_config import init_logging
-from schedule_calculator import calculate_schedule_time, calculate_sun_times, get_schedule_description, time_to_cron
-from shelly_client import ShellyClient
+from schedule_calculator import calculate_sun_times, hm, resolve_schedules
+from shelly_client import ShellyClient, ShellyMethodNotFoundError
 
 SWITCH_ID = 0
+MAX_PARALLEL_REQUESTS = 4
 
 
 def log_configuration(config: ShellyConfig) -> None:
     logger.info("Configuration loaded successfully:")
-    logger.info(f"  Device IP: {config.shelly_ip}")
-    logger.info(f"  Location: {config.latitude}, {config.longitude}")
-    logger.info(f"  Timezone: {config.timezone}")
-    logger.info(f"  Schedules: {len(config.get_schedules())} defined")
-    logger.info(f"  Log level: {config.log_level}")
+    logger.info("  Device IP: {}", config.shelly_ip)
+    logger.info("  Location: {}, {}", config.latitude, config.longitude)
+    logger.info("  Timezone: {}", config.timezone)
+    logger.info("  Schedules: {} defined", len(config.get_schedules()))
+    logger.info("  Log level: {}", config.log_level)
+
+
+def summarize_device_schedule(schedule: dict[str, Any]) -> tuple[Any, Any, Any, str, str]:
+    """Project a device schedule job to (id, timespec, switch_id, action, status)."""
+    try:
+        params = schedule["calls"][0]["params"]
+    except (KeyError, IndexError, TypeError):
+        params = {}
+    action = "ON" if params.get("on") else "OFF"
+    status = "enabled" if schedule.get("enable") else "disabled"
+    return schedule.get("id"), schedule.get("timespec"), params.get("id"), action, status
 
 
 def show_existing_schedules(client: ShellyClient) -> list:
@@ -27,101 +40,110 @@ def show_existing_schedules(client: ShellyClient) -> list:
     if len(schedules) == 0:
         logger.info("No existing schedules on device")
     else:
-        logger.info(f"Found {len(schedules)} existing schedule(s):")
+        logger.info("Found {} existing schedule(s):", len(schedules))
+        log_info = logger.info
         for schedule in schedules:
-            schedule_id = schedule.get("id")
-            timespec = schedule.get("timespec")
-            enabled = schedule.get("enable")
-            call = schedule.get("calls", [{}])[0]
-            switch_id = call.get("params", {}).get("id")
-            turn_on = call.get("params", {}).get("on")
-            action = "ON" if turn_on else "OFF"
-            status = "enabled" if enabled else "disabled"
-            logger.info(f"  - ID {schedule_id}: {timespec} → Switch {switch_id} = {action} ({status})")
+            log_info("  - ID {}: {} → Switch {} = {} ({})", *summarize_device_schedule(schedule))
     return schedules
 
 
-def create_schedules(
-    client: ShellyClient, config: ShellyConfig, sun_times: dict[str, datetime]
-) -> list[tuple[datetime, str]]:
-    """Create schedules on device and return resolved times/actions."""
-    resolved: list[tuple[datetime, str]] = []
-    for schedule in config.get_schedules():
-        schedule_time = calculate_schedule_time(schedule, sun_times, config.timezone)
-        cron = time_to_cron(schedule_time)
-        turn_on = schedule.action == "on"
+def delete_existing_schedules(client: ShellyClient, existing_schedules: list | None) -> bool:
+    """Delete all schedules on device, via Schedule.DeleteAll where the firmware supports it. Returns False if any delete failed."""
+    if existing_schedules == []:
+        return True
 
-        schedule_id = client.create_schedule(timespec=cron, switch_id=SWITCH_ID, turn_on=turn_on)
-        description = get_schedule_description(schedule, schedule_time)
-        logger.success(f"Created: {description} (ID: {schedule_id})")
-        action = "ON" if turn_on else "OFF"
-        resolved.append((schedule_time, action))
-    return resolved
+    all_deleted = True
+    try:
+        client.delete_all_schedules_fast()
+        if existing_schedules is None:
+            logger.info("Deleted all existing schedules")
+        else:
+            logger.info("Deleted {} existing schedule(s)", len(existing_schedules))
+    except ShellyMethodNotFoundError:
+        logger.warning("Schedule.DeleteAll not available, deleting schedules one by one")
+        if existing_schedules is None:
+            existing_schedules = client.list_schedules()
+        deleted_count = client.delete_all_schedules(schedules=existing_schedules)
+        logger.info("Deleted {} existing schedule(s)", deleted_count)
+        all_deleted = deleted_count == len(existing_schedules)
+    logger.info("")
+    return all_deleted
 
 
-def verify_schedules(client: ShellyClient, config: ShellyConfig) -> None:
-    logger.info("")
-    logger.info("=== AFTER CHANGES ===")
-    schedules_after = client.list_schedules()
-    logger.info(f"Configured {len(schedules_after)} schedule(s) on device")
+def create_schedules(client: ShellyClient, resolved: list[tuple[datetime, str, bool, str]]) -> list[int]:
+    """Create resolved schedules on device and return their IDs (-1 where the device returned none)."""
+    schedule_ids = client.create_schedules([(cron, SWITCH_ID, turn_on) for _, cron, turn_on, _ in resolved])
 
-    logger.info("")
-    logger.info("=== VERIFICATION ===")
+    for (_, _, _, description), schedule_id in zip(resolved, schedule_ids):
+        logger.success("Created: {} (ID: {})", description, schedule_id)
+    return schedule_ids
+
+
+def verify_schedules(client: ShellyClient, config: ShellyConfig, created_ids: list[int], strict: bool = False) -> None:
+    """Verify schedule count. Trusts the create responses unless strict, which re-lists the device."""
     expected_count = len(config.get_schedules())
-    if len(schedules_after) != expected_count:
-        logger.error(f"Expected {expected_count} schedule(s) but found {len(schedules_after)}!")
-        sys.exit(1)
+    if not strict and len(created_ids) == expected_count and all(schedule_id >= 0 for schedule_id in created_ids):
+        logger.info("")
+        logger.info("=== VERIFICATION ===")
+        logger.opt(lazy=True).info("✓ All {} schedules created on device (IDs: {})", lambda: expected_count, lambda: ", ".join(map(str, created_ids)))
+    else:
+        logger.info("")
+        logger.info("=== AFTER CHANGES ===")
+        schedules_after = client.list_schedules()
+        logger.info("Configured {} schedule(s) on device", len(schedules_after))
+
+        logger.info("")
+        logger.info("=== VERIFICATION ===")
+        if len(schedules_after) != expected_count:
+            logger.error("Expected {} schedule(s) but found {}!", expected_count, len(schedules_after))
+            sys.exit(1)
 
-    logger.info(f"✓ All {len(schedules_after)} schedules verified on device")
-    logger.info(f"✓ Schedules are recurring daily (will trigger every day at the same time)")
+        logger.info("✓ All {} schedules verified on device", len(schedules_after))
 
+    logger.info("✓ Schedules are recurring daily (will trigger every day at the same time)")
 
-def show_summary(
-    config: ShellyConfig, sun_times: dict[str, datetime], resolved_times: list[tuple[datetime, str]]
-) -> None:
+
+def show_summary(config: ShellyConfig, sun_times: dict[str, datetime], resolved: list[tuple[datetime, str, bool, str]]) -> None:
     logger.info("")
     logger.success("✓ Configuration complete!")
     logger.info("")
     logger.info("=== SCHEDULE SUMMARY ===")
 
-    logger.info(f"Sun times today: Sunrise {sun_times['sunrise'].strftime('%H:%M')}, Sunset {sun_times['sunset'].strftime('%H:%M')}")
+    logger.info("Sun times today: Sunrise {}, Sunset {}", hm(sun_times["sunrise"]), hm(sun_times["sunset"]))
     logger.info("")
-    logger.info(f"Created {len(config.get_schedules())} recurring daily schedules")
-    if resolved_times:
+    logger.info("Created {} recurring daily schedules", len(config.get_schedules()))
+    if resolved:
         logger.info("Added schedule times (today):")
-        for schedule_time, action in resolved_times:
-            logger.success(f"  - {schedule_time.strftime('%H:%M')} → Lights {action}")
+        for schedule_time, _, turn_on, _ in resolved:
+            logger.success("  - {} → Lights {}", hm(schedule_time), "ON" if turn_on else "OFF")
     logger.info("Note: Times will drift ~2 minutes per day as sunrise/sunset changes")
 
 
-def main() -> None:
+def main(config: ShellyConfig, strict: bool = False) -> None:
+    """Apply schedules from an already loaded config; the caller loads it once for logging setup too."""
     try:
-        logger.info("Loading configuration...")
-        config = ShellyConfig.from_yaml()
-
         log_configuration(config)
 
-        client = ShellyClient(config.shelly_ip)
+        with ShellyClient(config.shelly_ip, max_connections=MAX_PARALLEL_REQUESTS) as client:
+            # The listing is only for the log; skip the round-trip when INFO is not shown
+            existing_schedules = show_existing_schedules(client) if config.log_level in ("DEBUG", "INFO") else None
+            all_deleted = delete_existing_schedules(client, existing_schedules)
 
-        existing_schedules = show_existing_schedules(client)
-
-        if existing_schedules:
-            deleted_count = client.delete_all_schedules(existing_schedules)
-            logger.info(f"Deleted {deleted_count} existing schedule(s)")
+            logger.info("Calculating sunrise/sunset times...")
+            now = datetime.now(config.tz)
+            sun_times = calculate_sun_times(config.latitude, config.longitude, config.timezone, now)
+            logger.info("  Sunrise: {}", hm(sun_times["sunrise"]))
+            logger.info("  Sunset: {}", hm(sun_times["sunset"]))
             logger.info("")
+            resolved = resolve_schedules(config.get_schedules(), sun_times, config.timezone, now)
 
-        logger.info("Calculating sunrise/sunset times...")
-        sun_times = calculate_sun_times(config.latitude, config.longitude, config.timezone)
-        logger.info(f"  Sunrise: {sun_times['sunrise'].strftime('%H:%M')}")
-        logger.info(f"  Sunset: {sun_times['sunset'].strftime('%H:%M')}")
-        logger.info("")
-
-        logger.info("Creating schedules...")
-        resolved_times = create_schedules(client, config, sun_times)
+            logger.info("Creating schedules...")
+            created_ids = create_schedules(client, resolved)
 
-        verify_schedules(client, config)
+            # Leftover schedules would not show in the create responses, so re-list the device
+            verify_schedules(client, config, created_ids, strict or not all_deleted)
 
-        show_summary(config, sun_times, resolved_times)
+        show_summary(config, sun_times, resolved)
 
     except Exception as e:
         logger.exception(f"Configuration failed: {e}")
@@ -129,11 +151,17 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Configure sunrise/sunset schedules on a Shelly device.")
+    parser.add_argument("--strict", action="store_true", help="re-list schedules from the device to verify the result")
+    args = parser.parse_args()
+
+    from colorama import init as colorama_init
+
     colorama_init(autoreset=True)
 
     try:
         config = ShellyConfig.from_yaml()
-        init_logging(config.log_level, config.log_file)
+        init_logging(config.log_level, config.log_file, config.debug_tracebacks)
     except Exception as e:
         init_logging("INFO")
         logger.error(f"Failed to load configuration: {e}")
@@ -141,4 +169,4 @@ if __name__ == "__main__":
         logger.error("Copy config.yaml.example to config.yaml and fill in your values.")
         sys.exit(1)
 
-    main()
+    main(config, args.strict)
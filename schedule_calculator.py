@@ -1,43 +1,131 @@
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
+import json
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
 
-from astral import Observer
-from astral.sun import sun
+from loguru import logger
 
-from config import Schedule
+from config import Schedule, get_tz
 
+# Shelly cron: second minute hour day-of-month month day-of-week
+CRON_FORMAT = "0 %d %d * * *"
+
+# All 1440 "HH:MM" strings of a day, indexed by minute of day
+_HM = tuple(f"{h:02d}:{m:02d}" for h in range(24) for m in range(60))
+
+
+def _sun_cache_file() -> Path:
+    """Path of the sun times cache persisted across runs; holds entries for a single day only."""
+    # Resolved on use, not at import: Path.home() raises RuntimeError when no home directory can be determined
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "shelly-automation" / "sun.json"
+
+
+def _read_sun_cache() -> dict[str, list[str]]:
+    """Load the on-disk sun times cache, empty if missing or unreadable."""
+    try:
+        data = json.loads(_sun_cache_file().read_bytes())
+    except (OSError, RuntimeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_sun_cache(entries: dict[str, list[str]]) -> None:
+    """Persist the sun times cache. Best effort: failures are logged and ignored."""
+    try:
+        cache_file = _sun_cache_file()
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(entries))
+    except (OSError, RuntimeError) as e:
+        logger.debug("Could not write sun times cache: {}", e)
+
+
+@lru_cache(maxsize=32)
+def _sun_times_for_day(latitude: float, longitude: float, timezone: str, day: date) -> tuple[datetime, datetime]:
+    """Compute (sunrise, sunset) for a location and calendar day, cached in memory and on disk."""
+    tz = get_tz(timezone)
+    day_iso = day.isoformat()
+    key = f"{latitude:.3f}|{longitude:.3f}|{day_iso}|{timezone}"
+
+    cache = _read_sun_cache()
+    try:
+        sunrise_iso, sunset_iso = cache[key]
+        return datetime.fromisoformat(sunrise_iso).astimezone(tz), datetime.fromisoformat(sunset_iso).astimezone(tz)
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    # astral is slow to import; load it only once sun times are actually needed
+    from astral import Observer
+    from astral.sun import sun
 
-def calculate_sun_times(latitude: float, longitude: float, timezone: str, date: datetime | None = None) -> dict[str, datetime]:
-    """Calculate sunrise and sunset times for given location and date. Pure function."""
     observer = Observer(latitude=latitude, longitude=longitude)
-    tz = ZoneInfo(timezone)
-    target_date = date if date else datetime.now(tz)
-    s = sun(observer, date=target_date, tzinfo=tz)
+    s = sun(observer, date=day, tzinfo=tz)
 
-    return {"sunrise": s["sunrise"], "sunset": s["sunset"]}
+    # Entries for other days are never read again, drop them
+    entries = {k: v for k, v in cache.items() if k.split("|")[2:3] == [day_iso]}
+    entries[key] = [s["sunrise"].isoformat(), s["sunset"].isoformat()]
+    _write_sun_cache(entries)
 
+    return s["sunrise"], s["sunset"]
 
-def calculate_schedule_time(schedule: Schedule, sun_times: dict[str, datetime], timezone: str) -> datetime:
-    """Calculate actual time for a schedule. Pure function."""
-    tz = ZoneInfo(timezone)
 
-    if schedule.time in ["sunrise", "sunset"]:
+def calculate_sun_times(latitude: float, longitude: float, timezone: str, date: datetime | None = None) -> dict[str, datetime]:
+    """Calculate sunrise and sunset times for given location and date. Cached per day in memory and on disk."""
+    target_date = date if date else datetime.now(get_tz(timezone))
+    sunrise, sunset = _sun_times_for_day(latitude, longitude, timezone, target_date.date())
+
+    return {"sunrise": sunrise, "sunset": sunset}
+
+
+def _resolve_schedule_time(schedule: Schedule, sun_times: dict[str, datetime], now: datetime) -> datetime:
+    """Resolve schedule to a datetime on the day of now. Pure function."""
+    hour_minute = schedule.hour_minute
+    if hour_minute is None:
         base_time = sun_times[schedule.time]
         return base_time + timedelta(minutes=schedule.offset)
     else:
-        hour, minute = map(int, schedule.time.split(":"))
-        return datetime.now(tz).replace(hour=hour, minute=minute, second=0, microsecond=0)
+        hour, minute = hour_minute
+        return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def calculate_schedule_time(schedule: Schedule, sun_times: dict[str, datetime], timezone: str, now: datetime | None = None) -> datetime:
+    """Calculate actual time for a schedule. Pure function."""
+    return _resolve_schedule_time(schedule, sun_times, now if now else datetime.now(get_tz(timezone)))
+
+
+def calculate_schedule_times(schedules: list[Schedule], sun_times: dict[str, datetime], timezone: str, now: datetime | None = None) -> list[datetime]:
+    """Calculate actual times for all schedules, sharing one timezone and clock read. Pure function."""
+    if now is None:
+        now = datetime.now(get_tz(timezone))
+    return [_resolve_schedule_time(schedule, sun_times, now) for schedule in schedules]
+
+
+def hm(dt: datetime) -> str:
+    """Format datetime as 'HH:MM' via table lookup. Pure function."""
+    return _HM[dt.hour * 60 + dt.minute]
 
 
 def time_to_cron(dt: datetime) -> str:
     """Convert datetime to Shelly cron format. Pure function."""
-    return f"0 {dt.minute} {dt.hour} * * *"
+    return CRON_FORMAT % (dt.minute, dt.hour)
 
 
 def get_schedule_description(schedule: Schedule, actual_time: datetime) -> str:
     """Get human-readable description of schedule. Pure function."""
-    time_desc = f"{schedule.time}+{schedule.offset}min" if schedule.offset != 0 else schedule.time
-    if schedule.time not in ["sunrise", "sunset"]:
+    if schedule.hour_minute is None and schedule.offset:
+        time_desc = f"{schedule.time}+{schedule.offset}min"
+    else:
         time_desc = schedule.time
     action_desc = "Turn ON" if schedule.action == "on" else "Turn OFF"
-    return f"{actual_time.strftime('%H:%M')} ({time_desc}) → {action_desc}"
+    return f"{hm(actual_time)} ({time_desc}) → {action_desc}"
+
+
+def resolve_schedules(
+    schedules: list[Schedule], sun_times: dict[str, datetime], timezone: str, now: datetime | None = None
+) -> list[tuple[datetime, str, bool, str]]:
+    """Resolve each schedule once to (time, cron, turn_on, description) for creating and reporting. Pure function."""
+    schedule_times = calculate_schedule_times(schedules, sun_times, timezone, now)
+    return [
+        (schedule_time, time_to_cron(schedule_time), schedule.action == "on", get_schedule_description(schedule, schedule_time))
+        for schedule, schedule_time in zip(schedules, schedule_times)
+    ]
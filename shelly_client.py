@@ -1,17 +1,80 @@
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
 
-import requests
+import urllib3
 from loguru import logger
+from urllib3.exceptions import HTTPError
+from urllib3.util.retry import Retry
+
+
+# orjson is optional: faster (de)serialization when installed, stdlib json otherwise
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    _json_loads = json.loads
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Statuses with which firmware without batch support rejects an array POST to /rpc
+BATCH_REJECTED_STATUSES = frozenset({400, 404, 405, 501})
+
+
+class ShellyHTTPError(HTTPError):
+    """Device answered with a non-success HTTP status."""
+
+
+class ShellyMethodNotFoundError(ValueError):
+    """Device firmware does not implement the requested RPC method."""
+
+
+def _build_create_params(timespec: str, switch_id: int, turn_on: bool, enabled: bool = True, condition_if_on: bool = False) -> Dict[str, Any]:
+    """Build Schedule.Create params for a Switch.Set job."""
+    params = {"enable": enabled, "timespec": timespec, "calls": [{"method": "Switch.Set", "params": {"id": switch_id, "on": turn_on}}]}
+
+    if condition_if_on:
+        params["condition"] = {"cmp": {"a": f"switch:{switch_id}.output", "b": True, "op": "=="}}
+
+    return params
 
 
 class ShellyClient:
     """Client for interacting with Shelly Gen 3 devices via RPC API."""
 
-    def __init__(self, ip: str, timeout: int = 10):
-        """Initialize Shelly client."""
+    def __init__(self, ip: str, timeout: int = 10, max_connections: int = 4):
+        """Initialize Shelly client with a keep-alive connection pool to the device."""
         self.ip = ip
         self.timeout = timeout
         self.base_url = f"http://{ip}/rpc"
+        self.max_connections = max_connections
+
+        # Retry connection failures and 5xx; urllib3 does not retry POST on status, so creates are never duplicated
+        retries = Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        self._pool = urllib3.PoolManager(num_pools=1, maxsize=max_connections, block=False, retries=retries)
+        # Cleared on first rejected batch so later batches go straight to individual calls
+        self._batch_supported = True
+        # Worker threads for individual-call fan-out, created on first use and reused until close()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def __enter__(self) -> "ShellyClient":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close pooled connections and worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._pool.clear()
 
     def _rpc_call(self, method: str, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
         """
@@ -25,36 +88,116 @@ class ShellyClient:
             Response JSON as dictionary
 
         Raises:
-            requests.RequestException: If request fails
+            urllib3.exceptions.HTTPError: If request fails or returns a non-success status
+            ShellyMethodNotFoundError: If the device does not know the method (HTTP 404 or RPC error code 404)
             ValueError: If response contains error
         """
         url = f"{self.base_url}/{method}"
 
         try:
             if params:
-                logger.info(f"Calling {method} with params: {params}")
-                response = requests.post(url, json=params, timeout=self.timeout)
+                logger.info("Calling {} with params: {}", method, params)
+                response = self._pool.request("POST", url, body=_json_dumps(params), headers=JSON_HEADERS, timeout=self.timeout)
             else:
-                logger.info(f"Calling {method}")
-                response = requests.get(url, timeout=self.timeout)
+                logger.info("Calling {}", method)
+                response = self._pool.request("GET", url, timeout=self.timeout)
 
-            response.raise_for_status()
-            data = response.json()
+            if response.status == 404:
+                raise ShellyMethodNotFoundError(f"{method} not supported by device (HTTP 404)")
+            if response.status >= 400:
+                raise ShellyHTTPError(f"HTTP {response.status} for {url}")
+            data = _json_loads(response.data)
 
             if isinstance(data, dict) and "error" in data:
                 error_msg = data["error"].get("message", "Unknown error")
+                if data["error"].get("code") == 404:
+                    raise ShellyMethodNotFoundError(f"{method} not supported by device: {error_msg}")
                 raise ValueError(f"RPC error: {error_msg}")
 
-            logger.info(f"Response from {method}: {data}")
+            logger.info("Response from {}: HTTP {}", method, response.status)
+            logger.debug("Response body from {}: {}", method, data)
             return data
 
-        except requests.RequestException as e:
+        except HTTPError as e:
             logger.error(f"Failed to connect to Shelly device at {self.ip}: {e}")
             raise
+        except ShellyMethodNotFoundError as e:
+            # Expected on older firmware; callers decide whether it is worth a warning
+            logger.debug(str(e))
+            raise
         except ValueError as e:
             logger.error(f"Invalid response from Shelly device: {e}")
             raise
 
+    def _rpc_batch(self, calls: List[Tuple[str, Dict[str, Any] | None]]) -> List[Dict[str, Any] | Exception]:
+        """
+        Make several RPC calls in a single JSON-RPC batch request.
+
+        Falls back to one request per call if the device rejects batching
+        (HTTP 400, 404, 405, 501 or a non-array reply) and remembers that for this client.
+        Individual calls run concurrently, up to max_connections at a time.
+
+        Args:
+            calls: List of (method, params) pairs
+
+        Returns:
+            Result dictionary per call in call order; a failed call yields its exception instead
+
+        Raises:
+            urllib3.exceptions.HTTPError: If the batch request fails or returns another error status (e.g. 5xx)
+        """
+        if not calls:
+            return []
+
+        if self._batch_supported:
+            payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params or {}} for i, (method, params) in enumerate(calls)]
+            logger.info("Calling batch of {} RPC(s): {}", len(calls), ", ".join(method for method, _ in calls))
+            try:
+                response = self._pool.request("POST", self.base_url, body=_json_dumps(payload), headers=JSON_HEADERS, timeout=self.timeout)
+                # A server error may come after the batch was applied; resending Schedule.Create one by one would duplicate it
+                if response.status >= 400 and response.status not in BATCH_REJECTED_STATUSES:
+                    raise ShellyHTTPError(f"HTTP {response.status} for {self.base_url}")
+                if response.status < 400:
+                    data = _json_loads(response.data)
+                    if isinstance(data, list):
+                        logger.info("Response from batch: HTTP {}", response.status)
+                        logger.debug("Response body from batch: {}", data)
+                        return self._unpack_batch(data, len(calls))
+            except HTTPError as e:
+                logger.error(f"Failed to connect to Shelly device at {self.ip}: {e}")
+                raise
+            except ValueError:
+                # Non-JSON reply to a batch: treat like a rejected batch
+                pass
+
+            logger.info("Device does not accept batch RPC, falling back to individual calls")
+            self._batch_supported = False
+
+        def call(method: str, params: Dict[str, Any] | None) -> Dict[str, Any] | Exception:
+            try:
+                return self._rpc_call(method, params)
+            except (HTTPError, ValueError) as e:
+                return e
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="shelly-rpc")
+        return list(self._executor.map(call, *zip(*calls)))
+
+    @staticmethod
+    def _unpack_batch(frames: List[Dict[str, Any]], count: int) -> List[Dict[str, Any] | Exception]:
+        """Order batch response frames by request id and turn error frames into ValueError."""
+        by_id = {frame.get("id"): frame for frame in frames if isinstance(frame, dict)}
+        results: List[Dict[str, Any] | Exception] = []
+        for i in range(count):
+            frame = by_id.get(i)
+            if frame is None:
+                results.append(ValueError(f"RPC error: no response for batch call {i}"))
+            elif "error" in frame:
+                results.append(ValueError(f"RPC error: {frame['error'].get('message', 'Unknown error')}"))
+            else:
+                results.append(frame.get("result", {}))
+        return results
+
     def list_schedules(self) -> List[Dict[str, Any]]:
         """List all schedules."""
         result = self._rpc_call("Schedule.List")
@@ -64,32 +207,49 @@ class ShellyClient:
         """Delete a schedule by ID."""
         self._rpc_call("Schedule.Delete", {"id": schedule_id})
 
+    def delete_all_schedules_fast(self) -> None:
+        """Delete all schedules with a single Schedule.DeleteAll call."""
+        self._rpc_call("Schedule.DeleteAll")
+
     def delete_all_schedules(self, schedules: List[Dict[str, Any]] | None = None) -> int:
-        """Delete all existing schedules. Returns number of schedules deleted."""
+        """
+        Delete all existing schedules one by one.
+
+        Args:
+            schedules: Schedules already fetched with list_schedules; listed from the device only if None
+
+        Returns:
+            Number of schedules deleted
+        """
         if schedules is None:
             schedules = self.list_schedules()
 
         if not schedules:
             return 0
 
+        schedule_ids = [schedule["id"] for schedule in schedules if schedule.get("id") is not None]
+        results = self._rpc_batch([("Schedule.Delete", {"id": schedule_id}) for schedule_id in schedule_ids])
+
         deleted_count = 0
-        for schedule in schedules:
-            schedule_id = schedule.get("id")
-            if schedule_id is not None:
-                try:
-                    self.delete_schedule(schedule_id)
-                    deleted_count += 1
-                except (requests.RequestException, ValueError) as e:
-                    logger.warning(f"Failed to delete schedule {schedule_id}: {e}")
+        for schedule_id, result in zip(schedule_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to delete schedule {schedule_id}: {result}")
+            else:
+                deleted_count += 1
 
         return deleted_count
 
     def create_schedule(self, timespec: str, switch_id: int, turn_on: bool, enabled: bool = True, condition_if_on: bool = False) -> int:
         """Create a new schedule. Returns created schedule ID."""
-        params = {"enable": enabled, "timespec": timespec, "calls": [{"method": "Switch.Set", "params": {"id": switch_id, "on": turn_on}}]}
+        result = self._rpc_call("Schedule.Create", _build_create_params(timespec, switch_id, turn_on, enabled, condition_if_on))
+        return result.get("id", -1)
 
-        if condition_if_on:
-            params["condition"] = {"cmp": {"a": f"switch:{switch_id}.output", "b": True, "op": "=="}}
+    def create_schedules(self, schedules: List[Tuple[str, int, bool]]) -> List[int]:
+        """Create several (timespec, switch_id, turn_on) schedules in one batch. Returns created IDs in order."""
+        results = self._rpc_batch([("Schedule.Create", _build_create_params(timespec, switch_id, turn_on)) for timespec, switch_id, turn_on in schedules])
 
-        result = self._rpc_call("Schedule.Create", params)
-        return result.get("id", -1)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        return [result.get("id", -1) for result in results]